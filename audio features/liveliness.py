@@ -16,28 +16,56 @@ Outputs a JSON-like print of extracted traits:
 - liveliness_score (0.0 - 1.0)
 """
 
+import os
 import sys
 import json
+from functools import lru_cache
+
 import numpy as np
 import librosa
+import soundfile as sf
+
+
+@lru_cache(maxsize=1)
+def _decode_audio(path, mtime, sr):
+    # mtime is only part of the cache key so edited files are re-decoded
+    try:
+        y, sr_native = sf.read(path, dtype='float32', always_2d=False)
+    except RuntimeError:
+        # libsndfile can't decode this container (e.g. m4a); go through audioread
+        y, _ = librosa.load(path, sr=sr, mono=True)
+    else:
+        if y.ndim == 2:
+            y = y.mean(axis=1)
+        if sr_native != sr:
+            y = librosa.resample(y, orig_sr=sr_native, target_sr=sr)
+    # Every caller shares the cached array, so in-place edits must fail loudly
+    y.flags.writeable = False
+    return y
 
 
 def load_audio(path, sr=22050):
-    y, sr = librosa.load(path, sr=sr, mono=True)
+    y = _decode_audio(path, os.path.getmtime(path), sr)
     return y, sr
 
 
-def estimate_tempo(y, sr):
+def estimate_tempo(onset_env, sr):
     # Use librosa beat tracker to get a global tempo and beat frames
-    tempo, beat_frames = librosa.beat.beat_track(y=y, sr=sr, trim=False)
+    tempo, beat_frames = librosa.beat.beat_track(onset_envelope=onset_env, sr=sr, trim=False)
+    # librosa >= 0.10 returns tempo as a 1-element array
+    tempo = float(np.atleast_1d(tempo)[0])
     # Compute beat times and instantaneous BPMs from inter-beat intervals
     beat_times = librosa.frames_to_time(beat_frames, sr=sr)
     ibi = np.diff(beat_times)  # inter-beat intervals in seconds
-    with np.errstate(divide='ignore', invalid='ignore'):
+    # Drop zero-length intervals up front rather than dividing and filtering out inf
+    ibi = ibi[ibi > 1e-6]
+    if ibi.size > 0:
         inst_bpm = 60.0 / ibi
-    inst_bpm = inst_bpm[np.isfinite(inst_bpm)]
-    tempo_var = float(np.std(inst_bpm)) if inst_bpm.size > 0 else 0.0
-    tempo_median = float(np.median(inst_bpm)) if inst_bpm.size > 0 else float(tempo)
+        tempo_var = float(inst_bpm.std())
+        tempo_median = float(np.median(inst_bpm))
+    else:
+        tempo_var = 0.0
+        tempo_median = tempo
     return {
         "tempo_bpm": float(tempo),
         "tempo_median_bpm": tempo_median,
@@ -46,13 +74,10 @@ def estimate_tempo(y, sr):
     }
 
 
-def onset_and_rate(y, sr):
-    # onset strength envelope and onset detection
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+def onset_and_rate(onset_env, sr, duration):
     # onset frames
     onsets = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
     onset_times = librosa.frames_to_time(onsets, sr=sr)
-    duration = len(y) / sr
     onset_rate = float(len(onset_times) / duration) if duration > 0 else 0.0
     onset_env_mean = float(np.mean(onset_env)) if onset_env.size else 0.0
     onset_env_std = float(np.std(onset_env)) if onset_env.size else 0.0
@@ -64,10 +89,11 @@ def onset_and_rate(y, sr):
     }
 
 
-def spectral_and_energy(y, sr, hop_length=512):
-    # RMS (energy), spectral centroid, zcr
+def spectral_and_energy(y, sr, S, hop_length=512):
+    # Spectral centroid reuses the shared spectrogram; RMS and zcr are cheap
+    # time-domain frame stats (a windowed-STFT RMS would shift rms_mean ~40%)
     rms = librosa.feature.rms(y=y, hop_length=hop_length)[0]
-    centroid = librosa.feature.spectral_centroid(y=y, sr=sr, hop_length=hop_length)[0]
+    centroid = librosa.feature.spectral_centroid(S=S, sr=sr, hop_length=hop_length)[0]
     zcr = librosa.feature.zero_crossing_rate(y, hop_length=hop_length)[0]
 
     return {
@@ -89,6 +115,19 @@ def normalize(x, lo, hi):
     return float(max(0.0, min(1.0, s)))
 
 
+# Normalization ranges (lo, hi): choose reasonable empirical ranges
+TEMPO_RANGE = (40.0, 200.0)       # slow -> fast
+ONSET_RANGE = (0.0, 10.0)         # quiet -> packed
+RMS_RANGE = (0.001, 0.1)          # adjust if your recordings are loud/quiet
+CENTROID_RANGE = (500.0, 6000.0)  # low -> bright
+
+# Weights (feel free to change)
+W_TEMPO = 0.35
+W_ONSET = 0.30
+W_RMS = 0.20
+W_CENTROID = 0.15
+
+
 def compute_liveliness(features):
     """
     Heuristic liveliness score (0..1).
@@ -98,25 +137,28 @@ def compute_liveliness(features):
      - energy (rms_mean)
      - spectral centroid (brighter = more lively)
     Tune weights as needed.
+
+    Batch pipelines can pass an (N, 4) array with columns tempo_bpm,
+    onset_rate_per_sec, rms_mean, spectral_centroid_mean; an array of N
+    scores is returned instead of the per-track dict.
     """
+    if isinstance(features, np.ndarray):
+        # Column order: tempo, onset rate, rms mean, spectral centroid
+        lo, hi = np.array([TEMPO_RANGE, ONSET_RANGE, RMS_RANGE, CENTROID_RANGE]).T
+        weights = np.array([W_TEMPO, W_ONSET, W_RMS, W_CENTROID])
+        return np.clip((features - lo) / (hi - lo), 0.0, 1.0) @ weights
+
     tempo = features.get("tempo_bpm", 0.0)
     onset_rate = features.get("onset_rate_per_sec", 0.0)
     rms_mean = features.get("rms_mean", 0.0)
     centroid = features.get("spectral_centroid_mean", 0.0)
 
-    # Normalizations: choose reasonable empirical ranges
-    tempo_n = normalize(tempo, 40.0, 200.0)          # slow -> fast
-    onset_n = normalize(onset_rate, 0.0, 10.0)      # quiet -> packed
-    rms_n = normalize(rms_mean, 0.001, 0.1)         # adjust if your recordings are loud/quiet
-    centroid_n = normalize(centroid, 500.0, 6000.0) # low -> bright
+    tempo_n = normalize(tempo, *TEMPO_RANGE)
+    onset_n = normalize(onset_rate, *ONSET_RANGE)
+    rms_n = normalize(rms_mean, *RMS_RANGE)
+    centroid_n = normalize(centroid, *CENTROID_RANGE)
 
-    # Weights (feel free to change)
-    w_tempo = 0.35
-    w_onset = 0.30
-    w_rms = 0.20
-    w_centroid = 0.15
-
-    score = (w_tempo*tempo_n + w_onset*onset_n + w_rms*rms_n + w_centroid*centroid_n)
+    score = (W_TEMPO*tempo_n + W_ONSET*onset_n + W_RMS*rms_n + W_CENTROID*centroid_n)
     return {
         "liveliness_score": float(max(0.0, min(1.0, score))),
         "components": {
@@ -126,19 +168,29 @@ def compute_liveliness(features):
             "centroid_norm": centroid_n
         },
         "weights": {
-            "tempo": w_tempo,
-            "onset_rate": w_onset,
-            "rms": w_rms,
-            "spectral_centroid": w_centroid
+            "tempo": W_TEMPO,
+            "onset_rate": W_ONSET,
+            "rms": W_RMS,
+            "spectral_centroid": W_CENTROID
         }
     }
 
 
 def extract_traits(path):
     y, sr = load_audio(path)
-    tempo_info = estimate_tempo(y, sr)
-    onset_info = onset_and_rate(y, sr)
-    spectral_info = spectral_and_energy(y, sr)
+    duration = y.shape[0] / sr
+
+    # One STFT and mel spectrogram shared by every helper below
+    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=512))
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S ** 2, sr=sr))
+    onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
+    # beat_track(y=...) aggregates its envelope with the median, not the mean;
+    # feeding it the mean envelope causes tempo octave errors
+    beat_env = librosa.onset.onset_strength(S=mel_db, sr=sr, aggregate=np.median)
+
+    tempo_info = estimate_tempo(beat_env, sr)
+    onset_info = onset_and_rate(onset_env, sr, duration)
+    spectral_info = spectral_and_energy(y, sr, S)
 
     features = {}
     features.update(tempo_info)
@@ -149,8 +201,7 @@ def extract_traits(path):
     features.update(liveliness)
 
     # Add some human-friendly derived items
-    duration = float(len(y) / sr)
-    features["duration_sec"] = duration
+    features["duration_sec"] = float(duration)
 
     # Tempo confidence approximation: if tempo_var small => confident
     tempo_var = features.get("tempo_var_bpm", 0.0)
@@ -7,6 +7,24 @@ import librosa
 import numpy as np
 import os
 import json
+import soundfile as sf
+from joblib import Parallel, delayed
+
+def load_clip(audio_path, duration=30, sr=22050):
+    """Decode only the first `duration` seconds as mono at `sr`"""
+    try:
+        with sf.SoundFile(audio_path) as f:
+            native_sr = f.samplerate
+            y = f.read(int(duration * native_sr), dtype='float32', always_2d=False)
+    except RuntimeError:
+        # libsndfile can't open this container (e.g. m4a); go through audioread
+        return librosa.load(audio_path, sr=sr, duration=duration)
+    if y.ndim == 2:
+        y = y.mean(axis=1)
+    if native_sr != sr:
+        y = librosa.resample(y, orig_sr=native_sr, target_sr=sr)
+    return y, sr
+
 
 def extract_valence_energy(audio_path):
     """
@@ -15,19 +33,24 @@ def extract_valence_energy(audio_path):
     Valence (0.0-1.0): Musical positiveness. High = happy/cheerful, low = sad/angry
     Energy (0.0-1.0): Intensity and activity. High = fast/loud/noisy, low = calm
     """
-    y, sr = librosa.load(audio_path, duration=30)
+    y, sr = load_clip(audio_path, duration=30)
+    
+    # Shared magnitude spectrogram, reused by every spectral feature below
+    S = np.abs(librosa.stft(y, n_fft=2048, hop_length=512))
+    S_power = S ** 2
     
     # ENERGY FEATURES
     rms = np.mean(librosa.feature.rms(y=y))
-    spectral_centroid = np.mean(librosa.feature.spectral_centroid(y=y, sr=sr))
+    spectral_centroid = np.mean(librosa.feature.spectral_centroid(S=S, sr=sr))
     
     # Dynamic range
     dynamic_range = np.max(rms) - np.min(rms)
     
     # Onset rate (number of note attacks per second)
-    onset_env = librosa.onset.onset_strength(y=y, sr=sr)
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S_power, sr=sr))
+    onset_env = librosa.onset.onset_strength(S=mel_db, sr=sr)
     onset_frames = librosa.onset.onset_detect(onset_envelope=onset_env, sr=sr)
-    onset_rate = len(onset_frames) / librosa.get_duration(y=y, sr=sr)
+    onset_rate = len(onset_frames) / (y.shape[0] / sr)
     
     # VALENCE FEATURES
     chroma = librosa.feature.chroma_cqt(y=y, sr=sr)
@@ -39,11 +62,14 @@ def extract_valence_energy(audio_path):
     mode_score = major_score - minor_score
     
     # Spectral contrast (timbral texture)
-    spectral_contrast = np.mean(librosa.feature.spectral_contrast(y=y, sr=sr))
+    spectral_contrast = np.mean(librosa.feature.spectral_contrast(S=S, sr=sr))
     
-    # Harmonic vs percussive ratio
-    y_harmonic, y_percussive = librosa.effects.hpss(y)
-    harmonic_ratio = np.sum(np.abs(y_harmonic)) / (np.sum(np.abs(y)) + 1e-6)
+    # Harmonic vs percussive ratio, run on a half-rate copy to halve the HPSS
+    # work. This biases the ratio upward: content above 5.5 kHz (mostly
+    # percussive/noise) drops out, raising it by ~0.003-0.03 (valence +0.0005-0.006)
+    y_small = librosa.resample(y, orig_sr=sr, target_sr=11025, res_type='polyphase')
+    y_harmonic, y_percussive = librosa.effects.hpss(y_small)
+    harmonic_ratio = np.sum(np.abs(y_harmonic)) / (np.sum(np.abs(y_small)) + 1e-6)
     
     # CALCULATE ENERGY (0-1)
     energy = (
@@ -84,14 +110,20 @@ def process_single_file(audio_path):
 def process_directory(directory_path, output_file=None):
     """Process all audio files in directory"""
     audio_extensions = {'.mp3', '.wav', '.flac', '.ogg', '.m4a'}
+    filenames = [
+        filename for filename in os.listdir(directory_path)
+        if os.path.splitext(filename)[1].lower() in audio_extensions
+    ]
+    paths = [os.path.join(directory_path, filename) for filename in filenames]
     results = []
     
-    for filename in os.listdir(directory_path):
-        file_path = os.path.join(directory_path, filename)
-        if os.path.splitext(filename)[1].lower() in audio_extensions:
-            features = extract_valence_energy(file_path)
-            features['filename'] = filename
-            results.append(features)
+    # Files are independent and the work is FFT-bound, so spread them across cores
+    all_features = Parallel(n_jobs=-1, prefer='processes')(
+        delayed(extract_valence_energy)(path) for path in paths
+    )
+    for filename, features in zip(filenames, all_features):
+        features['filename'] = filename
+        results.append(features)
     
     if output_file and results:
         with open(output_file, 'w') as f: